@@ -14,3 +14,10 @@ collection = db["operatorURLS"]
 
 operatorCollection = db["operatorDetails"]
 
+
+# Versioned snapshots of the crawls (see operators/snapshots.py)
+snapshotRuns = db["snapshotRuns"]
+
+snapshotDeltas = db["snapshotDeltas"]
+
+snapshotBaselines = db["snapshotBaselines"]
@@ -0,0 +1,134 @@
+"""This file computes, applies and folds the field-level deltas between
+two states of a crawled collection. A state maps an operator key to its
+record.
+
+Each field change is a dictionary that holds an "old" value only if the
+field existed before and a "new" value only if it exists after, so that a
+missing field is never confused with a field whose value is None.
+"""
+
+from typing import Dict, Iterable, List
+
+
+def computeDeltas(previous: Dict[str, Dict], current: Dict[str, Dict]) -> List[Dict]:
+    """
+    Compares two states of a collection and returns the field-level
+    changes per operator.
+
+    Args:
+        previous: Operator records of the previous run, keyed by operator
+        current: Operator records of the new run, keyed by operator
+
+    Returns:
+        list: One delta per added, removed or changed operator, e.g.
+            {
+              "operator": "https://www.safaribookings.com/profile/p1",
+              "op": "changed",
+              "fields": {"Price range": {"old": "$100 - $200", "new": "$120 - $250"}}
+            }
+    """
+    deltas = []
+
+    for key, record in current.items():
+        old = previous.get(key)
+
+        if old is None:
+            fields = {f: {"new": v} for f, v in record.items()}
+            deltas.append({"operator": key, "op": "added", "fields": fields})
+            continue
+
+        fields = {}
+        for f in set(old) | set(record):
+            change = {}
+            if f in old:
+                change["old"] = old[f]
+            if f in record:
+                change["new"] = record[f]
+            if not isUnchanged(change):
+                fields[f] = change
+
+        if fields:
+            deltas.append({"operator": key, "op": "changed", "fields": fields})
+
+    for key, old in previous.items():
+        if key not in current:
+            fields = {f: {"old": v} for f, v in old.items()}
+            deltas.append({"operator": key, "op": "removed", "fields": fields})
+
+    return deltas
+
+
+def isUnchanged(change: Dict) -> bool:
+    """Returns True if a field change has the same value before and after."""
+    return ("old" in change) == ("new" in change) and change.get("old") == change.get("new")
+
+
+def applyDeltas(state: Dict[str, Dict], deltas: Iterable[Dict]) -> Dict[str, Dict]:
+    """Applies deltas (sorted by sequence) on top of a state, in place."""
+    for delta in deltas:
+        key = delta["operator"]
+
+        if delta["op"] == "removed":
+            state.pop(key, None)
+            continue
+
+        record = state.setdefault(key, {})
+        for f, change in delta["fields"].items():
+            if "new" in change:
+                record[f] = change["new"]
+            else:
+                record.pop(f, None)
+
+    return state
+
+
+def foldDeltas(deltas: Iterable[Dict]) -> Dict[str, Dict]:
+    """
+    Folds consecutive deltas (sorted by sequence) into the net change per
+    operator, keeping the first old value and the last new value of each
+    field. Operators whose fields end up unchanged are left out.
+    """
+    folded = {}
+
+    for delta in deltas:
+        key = delta["operator"]
+        entry = folded.get(key)
+
+        if entry is None:
+            entry = folded[key] = {
+                "before": delta["op"] != "added",
+                "after": True,
+                "fields": {}
+            }
+
+        for f, change in delta["fields"].items():
+            if f not in entry["fields"]:
+                entry["fields"][f] = {"old": change["old"]} if "old" in change else {}
+
+            entry["fields"][f].pop("new", None)
+            if "new" in change:
+                entry["fields"][f]["new"] = change["new"]
+
+        entry["after"] = delta["op"] != "removed"
+
+    report = {}
+    for key, entry in folded.items():
+        if not entry["before"] and not entry["after"]:
+            continue
+
+        if not entry["before"]:
+            op = "added"
+        elif not entry["after"]:
+            op = "removed"
+        else:
+            op = "changed"
+
+        fields = {
+            f: change for f, change in entry["fields"].items()
+            if not isUnchanged(change)
+        }
+
+        if fields or op != "changed":
+            report[key] = {"op": op, "fields": fields}
+
+    return report
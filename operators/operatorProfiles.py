@@ -18,6 +18,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Local import
 from operators.operatorURLData import getOperatorData
+from operators.snapshots import createSnapshot
 from mongodb import collection, operatorCollection
 
 
@@ -278,10 +279,23 @@ def getOperatorProfileDetails():
 
     # Filter out None results (failed ones)
     valid_results = [res for res in results if res]
+    if len(valid_results) < len(results):
+        logging.warning(f"{len(results) - len(valid_results)} operators could not be fetched")
 
     # Insert into MongoDB
     if valid_results:
         insert_result = operatorCollection.insert_many(valid_results)
+
+        # Keep the history of this crawl before it is overwritten next time
+        try:
+            attempted = [
+                f"https://www.safaribookings.com/profile/{operator['id']}"
+                for operator in operators
+            ]
+            createSnapshot(valid_results, source="operatorDetails", attempted=attempted)
+        except Exception as e:
+            logging.error(f"Failed to save snapshot of operator details: {e}")
+
         return insert_result.inserted_ids
     else:
         return []
@@ -0,0 +1,437 @@
+"""This file keeps a versioned history of the crawls stored in MongoDB.
+
+Every crawl is recorded as a run id plus per-operator, field-level deltas
+against the previous run. Old deltas are periodically folded into a full
+baseline so that the history stays small. Every compaction keeps its own
+baseline, so older periods can still be compared baseline to baseline,
+while recent runs are compared by reading only the deltas in between.
+
+Usage examples:
+  python operators/snapshots.py runs
+  python operators/snapshots.py diff 20250101-120000 20250108-120000
+  python operators/snapshots.py diff 20250101-120000 20250108-120000 --fields "Price range" "Reviews score"
+  python operators/snapshots.py compact --keep 4
+  python operators/snapshots.py runs --source operatorURLS
+
+Every command works on the operator details by default, pass
+`--source operatorURLS` to work on the list of operator URLs instead.
+"""
+
+import os
+import sys
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from pymongo.errors import DuplicateKeyError
+
+# Add parent directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Local import
+from operators.deltas import computeDeltas, applyDeltas, foldDeltas
+from mongodb import snapshotRuns, snapshotDeltas, snapshotBaselines
+
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+# Field used to identify an operator across runs, per crawled collection
+SOURCE_KEYS = {
+    "operatorDetails": "URL",
+    "operatorURLS": "id"
+}
+
+
+def ensureIndexes():
+    """Creates the indexes used to look up runs, deltas and baselines."""
+    snapshotRuns.create_index([("source", 1), ("sequence", 1)], unique=True)
+    snapshotDeltas.create_index([("source", 1), ("sequence", 1)])
+    snapshotBaselines.create_index([("source", 1), ("sequence", 1)])
+
+
+def getRun(source: str, runId: str) -> Dict:
+    """
+    Returns the run document with the given id.
+
+    Raises:
+        ValueError: If the run does not exist for this source or was
+        never completed.
+    """
+    run = snapshotRuns.find_one({"_id": runId, "source": source})
+    if not run:
+        raise ValueError(f"Run '{runId}' not found for '{source}'")
+    if run.get("complete") is False:
+        raise ValueError(f"Run '{runId}' was not completed")
+    return run
+
+
+def deltaQuery(source: str, after: int, upTo: Optional[int] = None) -> Dict:
+    """
+    Builds the query for the deltas recorded after sequence `after` and up
+    to `upTo`, skipping the deltas of runs that were never completed.
+    """
+    incomplete = [
+        run["sequence"] for run in snapshotRuns.find({"source": source, "complete": False})
+    ]
+
+    sequence = {"$gt": after, "$nin": incomplete}
+    if upTo is not None:
+        sequence["$lte"] = upTo
+
+    return {"source": source, "sequence": sequence}
+
+
+def latestBaseline(source: str, sequence: Optional[int] = None) -> Optional[Dict]:
+    """Returns the most recent completed baseline run at or before `sequence`."""
+    query = {"source": source, "baseline": True, "complete": {"$ne": False}}
+    if sequence is not None:
+        query["sequence"] = {"$lte": sequence}
+    return snapshotRuns.find_one(query, sort=[("sequence", -1)])
+
+
+def resolveRun(source: str, run: Dict) -> Dict:
+    """
+    Returns the run whose state can be rebuilt in place of `run`. The
+    deltas of compacted runs are gone, so they fall back to the baseline
+    of their compaction period.
+    """
+    if not run.get("compacted"):
+        return run
+
+    baseline = latestBaseline(source, run["sequence"])
+    logging.warning(
+        f"Run '{run['_id']}' has been compacted, using baseline '{baseline['_id']}' instead"
+    )
+    return baseline
+
+
+def loadState(source: str, sequence: Optional[int] = None) -> Dict[str, Dict]:
+    """
+    Rebuilds the operator records of a run from the nearest baseline and
+    the deltas recorded after it. Defaults to the latest run. Compacted
+    runs resolve to the baseline of their period.
+    """
+    baseline = latestBaseline(source, sequence)
+    if not baseline:
+        return {}
+
+    state = {
+        doc["operator"]: doc["record"]
+        for doc in snapshotBaselines.find({"source": source, "sequence": baseline["sequence"]})
+    }
+
+    deltas = snapshotDeltas.find(
+        deltaQuery(source, baseline["sequence"], sequence), sort=[("sequence", 1)]
+    )
+    return applyDeltas(state, deltas)
+
+
+def createSnapshot(records: List[Dict], source: str = "operatorDetails",
+                   attempted: Optional[List[str]] = None) -> str:
+    """
+    Records a crawl as a new run. The first run of a source is stored as a
+    full baseline, every later run only stores its deltas against the
+    previous run.
+
+    The run document is inserted first with `complete` set to False, so
+    that the unique index reserves its sequence before any delta is
+    written. Runs that are not completed are ignored when rebuilding
+    states and reports.
+
+    Operators listed in `attempted` but missing from `records` failed to
+    be fetched, they keep their previous state instead of being recorded
+    as removed.
+
+    Args:
+        records: The operator records produced by the crawl
+        source: Name of the crawled collection, see SOURCE_KEYS
+        attempted: Keys of all operators the crawl tried to fetch
+
+    Returns:
+        str: The run id of the new snapshot
+    """
+    ensureIndexes()
+    keyField = SOURCE_KEYS[source]
+
+    current = {}
+    duplicates = 0
+    for record in records:
+        record = {f: v for f, v in record.items() if f != "_id"}
+        key = str(record[keyField])
+        if key in current:
+            duplicates += 1
+        current[key] = record
+
+    if duplicates:
+        logging.warning(f"{duplicates} operators share a '{keyField}' with another one, keeping the last")
+
+    lastRun = snapshotRuns.find_one({"source": source}, sort=[("sequence", -1)])
+    sequence = lastRun["sequence"] + 1 if lastRun else 1
+    isBaseline = latestBaseline(source) is None
+
+    now = datetime.now(timezone.utc)
+    runId = now.strftime("%Y%m%d-%H%M%S")
+
+    run = {
+        "_id": runId,
+        "source": source,
+        "sequence": sequence,
+        "createdAt": now,
+        "total": len(current),
+        "baseline": isBaseline,
+        "changes": 0,
+        "complete": False
+    }
+
+    # Reserve the sequence, a concurrent crawl of the same source fails here
+    try:
+        snapshotRuns.insert_one(run)
+    except DuplicateKeyError as e:
+        if "_id" not in (e.details or {}).get("keyPattern", {}):
+            raise
+        run["_id"] = runId = f"{runId}-{sequence}"
+        snapshotRuns.insert_one(run)
+
+    try:
+        run["changes"] = saveRunData(run, current, attempted)
+    except Exception:
+        # Leave no orphan documents behind under this sequence, which the
+        # run document still reserves
+        snapshotDeltas.delete_many({"source": source, "sequence": sequence})
+        snapshotBaselines.delete_many({"source": source, "sequence": sequence})
+        snapshotRuns.delete_one({"_id": runId})
+        raise
+
+    snapshotRuns.update_one(
+        {"_id": runId}, {"$set": {"complete": True, "changes": run["changes"], "total": len(current)}}
+    )
+    logging.info(f"Saved snapshot '{runId}' of '{source}' with {run['changes']} changes")
+
+    return runId
+
+
+def saveRunData(run: Dict, current: Dict[str, Dict],
+                attempted: Optional[List[str]] = None) -> int:
+    """
+    Writes the baseline or the deltas of a reserved run. Operators that
+    were attempted but not fetched are copied from the previous state
+    into `current`.
+
+    Returns:
+        int: The number of deltas written
+    """
+    source, runId, sequence = run["source"], run["_id"], run["sequence"]
+
+    if run["baseline"]:
+        baselineDocs = [
+            {"source": source, "runId": runId, "sequence": sequence,
+             "operator": key, "record": record}
+            for key, record in current.items()
+        ]
+        if baselineDocs:
+            snapshotBaselines.insert_many(baselineDocs)
+        return 0
+
+    previous = loadState(source, sequence - 1)
+
+    if attempted is not None:
+        failed = [key for key in attempted if key not in current and key in previous]
+        for key in failed:
+            current[key] = previous[key]
+
+    deltas = computeDeltas(previous, current)
+    for delta in deltas:
+        delta.update({"source": source, "runId": runId, "sequence": sequence})
+    if deltas:
+        snapshotDeltas.insert_many(deltas)
+    return len(deltas)
+
+
+def compactSnapshots(source: str = "operatorDetails", keep: int = 4) -> Optional[str]:
+    """
+    Folds all deltas older than the last `keep` runs into a full baseline.
+    Earlier baselines are kept, one per compaction period, and only the
+    deltas covered by the new baseline are deleted. The runs in between
+    are marked as compacted and resolve to the baseline before them.
+
+    Args:
+        source: Name of the crawled collection, see SOURCE_KEYS
+        keep: Number of most recent runs whose deltas are kept
+
+    Returns:
+        str: The run id of the new baseline, or None if nothing was compacted
+
+    Raises:
+        ValueError: If `keep` is negative.
+    """
+    if keep < 0:
+        raise ValueError(f"keep must be 0 or more, got {keep}")
+
+    runs = list(snapshotRuns.find(
+        {"source": source, "complete": {"$ne": False}}, sort=[("sequence", -1)]
+    ).limit(keep + 1))
+    if len(runs) <= keep:
+        logging.info("Not enough runs to compact.")
+        return None
+
+    target = runs[-1]
+    current = latestBaseline(source)
+    if current and current["sequence"] >= target["sequence"]:
+        logging.info(f"Run '{current['_id']}' is already the latest baseline.")
+        return None
+
+    state = loadState(source, target["sequence"])
+    baselineDocs = [
+        {"source": source, "runId": target["_id"], "sequence": target["sequence"],
+         "operator": key, "record": record}
+        for key, record in state.items()
+    ]
+    if baselineDocs:
+        snapshotBaselines.insert_many(baselineDocs)
+    snapshotRuns.update_one({"_id": target["_id"]}, {"$set": {"baseline": True}})
+
+    # Drop the deltas that are now covered by the new baseline
+    after = current["sequence"] if current else 0
+    snapshotRuns.update_many(
+        {"source": source, "sequence": {"$gt": after, "$lt": target["sequence"]}},
+        {"$set": {"compacted": True}}
+    )
+    deleted = snapshotDeltas.delete_many(
+        {"source": source, "sequence": {"$gt": after, "$lte": target["sequence"]}}
+    )
+
+    logging.info(
+        f"Compacted '{source}' into baseline '{target['_id']}', "
+        f"removed {deleted.deleted_count} deltas"
+    )
+    return target["_id"]
+
+
+def diffRuns(fromRunId: str, toRunId: str, source: str = "operatorDetails",
+             fields: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Reports which operators changed between two runs, reading only the
+    deltas recorded in between. When the range crosses a compaction
+    baseline, the states at the start and at that baseline are compared
+    directly and the deltas after it are folded on top.
+
+    Args:
+        fromRunId: The older run
+        toRunId: The newer run
+        source: Name of the crawled collection, see SOURCE_KEYS
+        fields: Only report changes to these fields
+
+    Returns:
+        dict: The net change per operator, see foldDeltas()
+    """
+    fromRun = getRun(source, fromRunId)
+    toRun = getRun(source, toRunId)
+
+    if fromRun["sequence"] > toRun["sequence"]:
+        raise ValueError(f"Run '{fromRunId}' is newer than '{toRunId}'")
+
+    fromRun = resolveRun(source, fromRun)
+    toRun = resolveRun(source, toRun)
+
+    start = fromRun["sequence"]
+    deltas = []
+
+    baseline = latestBaseline(source, toRun["sequence"])
+    if baseline and baseline["sequence"] > start:
+        deltas = computeDeltas(loadState(source, start), loadState(source, baseline["sequence"]))
+        start = baseline["sequence"]
+
+    deltas += list(snapshotDeltas.find(
+        deltaQuery(source, start, toRun["sequence"]), sort=[("sequence", 1)]
+    ))
+    report = foldDeltas(deltas)
+
+    if fields:
+        filtered = {}
+        for key, entry in report.items():
+            entryFields = {f: c for f, c in entry["fields"].items() if f in fields}
+            if entryFields:
+                filtered[key] = {"op": entry["op"], "fields": entryFields}
+        report = filtered
+
+    return report
+
+
+def printReport(report: Dict[str, Dict]):
+    """Prints a diff report in a readable form."""
+    counts = {"added": 0, "removed": 0, "changed": 0}
+
+    for key in sorted(report):
+        entry = report[key]
+        counts[entry["op"]] += 1
+        print(f"[{entry['op']}] {key}")
+        if entry["op"] == "changed":
+            for f in sorted(entry["fields"]):
+                change = entry["fields"][f]
+                print(f"    {f}: {change.get('old')!r} -> {change.get('new')!r}")
+
+    print(
+        f"{counts['added']} added, {counts['removed']} removed, "
+        f"{counts['changed']} changed"
+    )
+
+
+def main():
+    # Options shared by every command, so they can follow the command name
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--source", default="operatorDetails", choices=sorted(SOURCE_KEYS),
+                        help="Crawled collection to work on.")
+
+    parser = argparse.ArgumentParser(description="Versioned snapshots of the crawled operators.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("runs", parents=[common], help="List the recorded runs.")
+
+    diffParser = commands.add_parser("diff", parents=[common],
+                                     help="Report changes between two runs.")
+    diffParser.add_argument("fromRun", help="Id of the older run.")
+    diffParser.add_argument("toRun", help="Id of the newer run.")
+    diffParser.add_argument("--fields", nargs="+", help="Only report these fields.")
+
+    compactParser = commands.add_parser("compact", parents=[common],
+                                        help="Fold old deltas into a baseline.")
+    compactParser.add_argument("--keep", type=int, default=4,
+                               help="Number of recent runs whose deltas are kept.")
+
+    args = parser.parse_args()
+
+    if args.command == "runs":
+        for run in snapshotRuns.find({"source": args.source}, sort=[("sequence", 1)]):
+            if run.get("complete") is False:
+                status = "incomplete"
+            elif run.get("baseline"):
+                status = "baseline"
+            elif run.get("compacted"):
+                status = "compacted"
+            else:
+                status = f"{run['changes']} changes"
+            print(f"{run['_id']}  {run['total']} operators  {status}")
+
+    elif args.command == "diff":
+        try:
+            report = diffRuns(args.fromRun, args.toRun, args.source, args.fields)
+        except ValueError as e:
+            logging.error(e)
+            sys.exit(1)
+        printReport(report)
+
+    elif args.command == "compact":
+        try:
+            compactSnapshots(args.source, args.keep)
+        except ValueError as e:
+            logging.error(e)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Tests for the field-level deltas used by the crawl snapshots."""
+
+import os
+import sys
+import copy
+
+# Add parent directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Local import
+from operators.deltas import computeDeltas, applyDeltas, foldDeltas
+
+
+def record(url, price, score, **extra):
+    return {"URL": url, "Price range": price, "Reviews score": score, **extra}
+
+
+CRAWLS = [
+    {
+        "a": record("a", "$100 - $200", "4.5"),
+        "b": record("b", "$300 - $400", None),
+        "c": record("c", "$50 - $80", "4.0", Website="c.com"),
+    },
+    {
+        "a": record("a", "$120 - $250", "4.5"),
+        "c": record("c", "$50 - $80", None),
+        "d": record("d", None, None),
+    },
+    {
+        "a": record("a", "$120 - $250", "4.7"),
+        "b": record("b", "$300 - $450", None),
+        "c": record("c", "$50 - $80", None, Website=None),
+    },
+]
+
+
+def chainDeltas(crawls):
+    return [
+        delta
+        for previous, current in zip(crawls, crawls[1:])
+        for delta in computeDeltas(previous, current)
+    ]
+
+
+def test_applyDeltasRebuildsNewState():
+    for previous, current in zip(CRAWLS, CRAWLS[1:]):
+        state = applyDeltas(copy.deepcopy(previous), computeDeltas(previous, current))
+        assert state == current
+
+
+def test_foldDeltasMatchesDirectDiff():
+    direct = {
+        delta["operator"]: {"op": delta["op"], "fields": delta["fields"]}
+        for delta in computeDeltas(CRAWLS[0], CRAWLS[-1])
+    }
+    assert foldDeltas(chainDeltas(CRAWLS)) == direct
+
+
+def test_removedThenAddedFoldsIntoChanged():
+    report = foldDeltas(chainDeltas(CRAWLS))
+    assert report["b"] == {
+        "op": "changed",
+        "fields": {"Price range": {"old": "$300 - $400", "new": "$300 - $450"}},
+    }
@@ -0,0 +1,269 @@
+"""Tests for the crawl snapshots, run against in-memory collections."""
+
+import os
+import sys
+import copy
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+# Add parent directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Local import
+from operators import snapshots
+from operators.deltas import computeDeltas, foldDeltas
+
+
+class Result:
+    def __init__(self, count=0):
+        self.deleted_count = count
+
+
+class Cursor(list):
+    def limit(self, count):
+        return Cursor(self[:count] if count else self)
+
+
+def matches(doc, query):
+    for field, condition in query.items():
+        value = doc.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for op, operand in condition.items():
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$nin" and value in operand:
+                return False
+            if op in ("$gt", "$lt", "$lte") and value is None:
+                return False
+            if op == "$gt" and not value > operand:
+                return False
+            if op == "$lt" and not value < operand:
+                return False
+            if op == "$lte" and not value <= operand:
+                return False
+    return True
+
+
+class Collection:
+    """The subset of a pymongo collection used by the snapshots."""
+
+    def __init__(self):
+        self.docs = []
+        self.unique = []
+
+    def create_index(self, keys, unique=False):
+        if unique:
+            self.unique.append([field for field, _ in keys])
+
+    def find(self, query=None, sort=None):
+        docs = [copy.deepcopy(d) for d in self.docs if matches(d, query or {})]
+        for field, direction in reversed(sort or []):
+            docs.sort(key=lambda d: d[field], reverse=direction < 0)
+        return Cursor(docs)
+
+    def find_one(self, query=None, sort=None):
+        docs = self.find(query, sort)
+        return docs[0] if docs else None
+
+    def insert_one(self, doc):
+        for fields in [["_id"]] + self.unique:
+            if "_id" in doc and any(
+                all(d.get(f) == doc.get(f) for f in fields) for d in self.docs
+            ):
+                raise DuplicateKeyError(
+                    "duplicate key", 11000, {"keyPattern": {f: 1 for f in fields}}
+                )
+        self.docs.append(copy.deepcopy(doc))
+
+    def insert_many(self, docs):
+        self.docs.extend(copy.deepcopy(d) for d in docs)
+
+    def update_one(self, query, update):
+        for doc in self.docs:
+            if matches(doc, query):
+                doc.update(update["$set"])
+                return
+
+    def update_many(self, query, update):
+        for doc in self.docs:
+            if matches(doc, query):
+                doc.update(update["$set"])
+
+    def delete_one(self, query):
+        for doc in self.docs:
+            if matches(doc, query):
+                self.docs.remove(doc)
+                return Result(1)
+        return Result(0)
+
+    def delete_many(self, query):
+        kept = [d for d in self.docs if not matches(d, query)]
+        count = len(self.docs) - len(kept)
+        self.docs = kept
+        return Result(count)
+
+
+class Clock:
+    """Stands in for datetime, moving one minute on every call to now()."""
+
+    current = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    @classmethod
+    def now(cls, tz=None):
+        cls.current += timedelta(minutes=1)
+        return cls.current
+
+
+@pytest.fixture(autouse=True)
+def collections(monkeypatch):
+    runs, deltas, baselines = Collection(), Collection(), Collection()
+    monkeypatch.setattr(snapshots, "snapshotRuns", runs)
+    monkeypatch.setattr(snapshots, "snapshotDeltas", deltas)
+    monkeypatch.setattr(snapshots, "snapshotBaselines", baselines)
+    monkeypatch.setattr(snapshots, "datetime", Clock)
+    return runs, deltas, baselines
+
+
+def record(url, price, score):
+    return {"URL": url, "Price range": price, "Reviews score": score}
+
+
+CRAWLS = [
+    [record("a", "$100", "4.5"), record("b", "$300", None)],
+    [record("a", "$120", "4.5"), record("b", "$300", "3.0"), record("c", "$50", None)],
+    [record("a", "$120", "4.7"), record("c", "$60", None)],
+    [record("a", "$150", "4.7"), record("c", "$60", "4.0"), record("d", "$10", None)],
+    [record("a", "$150", "4.8"), record("d", "$15", None)],
+]
+
+
+def state(crawl):
+    return {r["URL"]: r for r in crawl}
+
+
+def snapshotAll(crawls):
+    return [snapshots.createSnapshot(copy.deepcopy(crawl)) for crawl in crawls]
+
+
+def test_incompleteRunsAreSkipped(collections):
+    runs, deltas, baselines = collections
+    snapshotAll(CRAWLS[:2])
+
+    # A crawl that died after writing part of its data
+    runs.insert_one({"_id": "dead", "source": "operatorDetails", "sequence": 3,
+                     "baseline": True, "complete": False})
+    deltas.insert_many([{"source": "operatorDetails", "runId": "dead", "sequence": 3,
+                         "operator": "a", "op": "removed", "fields": {}}])
+
+    assert snapshots.latestBaseline("operatorDetails")["sequence"] == 1
+    assert snapshots.loadState("operatorDetails") == state(CRAWLS[1])
+
+    snapshots.createSnapshot(copy.deepcopy(CRAWLS[2]))
+    assert snapshots.loadState("operatorDetails") == state(CRAWLS[2])
+
+    with pytest.raises(ValueError):
+        snapshots.diffRuns("dead", "dead")
+
+
+def test_failedSaveIsRolledBack(collections):
+    runs, deltas, baselines = collections
+    snapshotAll(CRAWLS[:1])
+
+    def failingInsert(docs):
+        Collection.insert_many(deltas, docs)
+        raise RuntimeError("connection lost")
+
+    deltas.insert_many = failingInsert
+    with pytest.raises(RuntimeError):
+        snapshots.createSnapshot(copy.deepcopy(CRAWLS[1]))
+
+    assert deltas.docs == []
+    assert [run["sequence"] for run in runs.docs] == [1]
+
+    del deltas.insert_many
+    snapshots.createSnapshot(copy.deepcopy(CRAWLS[1]))
+    assert snapshots.loadState("operatorDetails") == state(CRAWLS[1])
+
+
+def test_runIdCollisionGetsSuffix(collections, monkeypatch):
+    runs, deltas, baselines = collections
+    fixed = datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    monkeypatch.setattr(Clock, "now", classmethod(lambda cls, tz=None: fixed))
+
+    first, second = snapshotAll(CRAWLS[:2])
+
+    assert first == "20250101-120000"
+    assert second == "20250101-120000-2"
+    assert snapshots.loadState("operatorDetails") == state(CRAWLS[1])
+
+
+def test_concurrentSequenceIsRejected(collections):
+    runs, deltas, baselines = collections
+    snapshotAll(CRAWLS[:1])
+
+    def racingInsert(doc):
+        # Another crawl reserves the same sequence just before this one
+        Collection.insert_one(runs, {"_id": "other", "source": doc["source"],
+                                     "sequence": doc["sequence"], "complete": False})
+        Collection.insert_one(runs, doc)
+
+    runs.insert_one = racingInsert
+    with pytest.raises(DuplicateKeyError):
+        snapshots.createSnapshot(copy.deepcopy(CRAWLS[1]))
+
+    assert deltas.docs == []
+
+
+def test_compactionTarget(collections):
+    runs, deltas, baselines = collections
+    ids = snapshotAll(CRAWLS)
+
+    assert snapshots.compactSnapshots(keep=2) == ids[2]
+
+    byId = {run["_id"]: run for run in runs.docs}
+    assert [i for i in ids if byId[i].get("baseline")] == [ids[0], ids[2]]
+    assert [i for i in ids if byId[i].get("compacted")] == [ids[1]]
+    assert sorted({d["sequence"] for d in deltas.docs}) == [4, 5]
+    assert sorted({d["sequence"] for d in baselines.docs}) == [1, 3]
+
+    assert snapshots.loadState("operatorDetails") == state(CRAWLS[4])
+    assert snapshots.loadState("operatorDetails", 3) == state(CRAWLS[2])
+    assert snapshots.loadState("operatorDetails", 1) == state(CRAWLS[0])
+
+    assert snapshots.compactSnapshots(keep=2) is None
+    assert snapshots.compactSnapshots(keep=10) is None
+    with pytest.raises(ValueError):
+        snapshots.compactSnapshots(keep=-1)
+
+
+def test_diffAcrossBaselines(collections):
+    ids = snapshotAll(CRAWLS)
+    snapshots.compactSnapshots(keep=2)
+
+    def direct(old, new):
+        return foldDeltas(computeDeltas(state(old), state(new)))
+
+    assert snapshots.diffRuns(ids[0], ids[4]) == direct(CRAWLS[0], CRAWLS[4])
+    assert snapshots.diffRuns(ids[2], ids[4]) == direct(CRAWLS[2], CRAWLS[4])
+    assert snapshots.diffRuns(ids[3], ids[4]) == direct(CRAWLS[3], CRAWLS[4])
+
+    # Compacted runs resolve to the baseline of their period
+    assert snapshots.diffRuns(ids[1], ids[3]) == direct(CRAWLS[0], CRAWLS[3])
+
+    with pytest.raises(ValueError):
+        snapshots.diffRuns(ids[4], ids[0])
+
+
+def test_failedFetchKeepsPreviousState():
+    snapshotAll(CRAWLS[:1])
+    snapshots.createSnapshot([record("a", "$120", "4.5")], attempted=["a", "b"])
+
+    assert snapshots.loadState("operatorDetails") == {
+        "a": record("a", "$120", "4.5"),
+        "b": record("b", "$300", None),
+    }
@@ -15,6 +15,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Local import
 import mongodb
+from operators.snapshots import createSnapshot
 
 
 # Configure logging
@@ -144,6 +145,18 @@ def getURLS() -> str:
             operatorURLS[count] = operator
             count += 1
 
+    # Keep the history of the operator list. A page that failed returns no
+    # operators, which would record all of them as removed, so the snapshot
+    # is only taken when every page came back.
+    failedPages = sum(1 for page_data in results if not page_data)
+    if failedPages or not operatorURLS:
+        logging.warning(f"{failedPages} of {pages} pages returned no operators, skipping the snapshot")
+    else:
+        try:
+            createSnapshot(list(operatorURLS.values()), source="operatorURLS")
+        except Exception as e:
+            logging.error(f"Failed to save snapshot of operator URLs: {e}")
+
     # Convert to JSON string before returning
     operatorURLS = json.dumps(operatorURLS, indent=2)
 